@@ -0,0 +1,112 @@
+import functools
+import re
+from typing import Dict, Iterable, List, Optional
+
+
+_DASH_TABLE = str.maketrans({"\u2013": "-", "\u2014": "-", "\u2212": "-"})
+_DASH_BYTES_RE = re.compile(b"\xe2\x80[\x93\x94]|\xe2\x88\x92")
+
+_SOLUTION_RE = re.compile(
+    r"x\s*(?:\[\s*(?P<bracket>\d+)\s*\]|(?P<plain>\d+))"
+    r"\s*=\s*(?P<value>[+-]?\d+(?:\.\d+)?(?:e[+-]?\d+)?)",
+    re.IGNORECASE,
+)
+_NUMBER_RE = re.compile(r"[+-]?\d+(?:\.\d+)?(?:e[+-]?\d+)?", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s")
+
+
+def normalize_dashes(value: str) -> str:
+    return value.translate(_DASH_TABLE)
+
+
+def normalize_dash_bytes(data: bytes) -> bytes:
+    return _DASH_BYTES_RE.sub(b"-", data)
+
+
+def check_contains(normalized_stdout: str, expected: List[str], fail_fast: bool = False) -> List[str]:
+    missing = []
+    found: Dict[str, bool] = {}
+    for item in expected:
+        normalized_item = normalize_dashes(item)
+        if normalized_item not in found:
+            found[normalized_item] = normalized_item in normalized_stdout
+        if not found[normalized_item]:
+            missing.append(item)
+            if fail_fast:
+                break
+    return missing
+
+
+@functools.lru_cache(maxsize=None)
+def compile_pattern(pattern: str) -> "re.Pattern[str]":
+    return re.compile(pattern)
+
+
+def precompile_patterns(patterns: Iterable[str]) -> None:
+    for pattern in patterns:
+        compile_pattern(pattern)
+
+
+def check_regex(normalized_stdout: str, expected: List[str], fail_fast: bool = False) -> List[str]:
+    missing = []
+    for pattern in expected:
+        if compile_pattern(pattern).search(normalized_stdout) is None:
+            missing.append(f"regex:{pattern}")
+            if fail_fast:
+                break
+    return missing
+
+
+def extract_solution(stdout: str) -> Dict[int, float]:
+    values: Dict[int, float] = {}
+    for bracket, plain, value in _SOLUTION_RE.findall(stdout):
+        if bracket:
+            values[int(bracket)] = float(value)
+        else:
+            index = int(plain)
+            if index not in values:
+                values[index] = float(value)
+    return values
+
+
+def check_solution(stdout: str, expected: List[float], tol: float) -> List[str]:
+    missing = []
+    found = extract_solution(stdout)
+    if not found:
+        return ["solution:not_found"]
+
+    start = 0 if 0 in found else 1
+    for key, expected_value in enumerate(expected, start=start):
+        actual = found.get(key)
+        if actual is None:
+            missing.append(f"solution:x{key}:not_found")
+        elif abs(actual - expected_value) > tol:
+            missing.append(f"solution:x{key}:expected≈{expected_value}")
+    return missing
+
+
+def find_last_number(text: str) -> Optional[str]:
+    window = 64
+    while True:
+        start = len(text) - window
+        if start <= 0:
+            matches = _NUMBER_RE.findall(text)
+            return matches[-1] if matches else None
+        # Число не может содержать пробельных символов, поэтому поиск с границы
+        # токена находит те же совпадения, что и поиск по всей строке.
+        boundary = _WHITESPACE_RE.search(text, start)
+        if boundary is not None:
+            matches = _NUMBER_RE.findall(text, boundary.end())
+            if matches:
+                return matches[-1]
+        window *= 2
+
+
+def parse_input_tolerance(input_text: str, default_tol: float) -> float:
+    last_number = find_last_number(input_text)
+    if last_number is None:
+        return default_tol
+    try:
+        return float(last_number) * 3
+    except ValueError:
+        return default_tol
@@ -3,13 +3,16 @@ import re
 import sys
 
 
+_LAB_RE = re.compile(r"lab[-_]?(\d+)", re.IGNORECASE)
+
+
 def detect_lab() -> str:
     explicit = os.getenv("LAB")
     if explicit:
         return explicit.strip()
 
     branch = os.getenv("GITHUB_HEAD_REF") or os.getenv("GITHUB_REF_NAME") or ""
-    match = re.search(r"lab[-_]?(\d+)", branch, flags=re.IGNORECASE)
+    match = _LAB_RE.search(branch)
     if match:
         return match.group(1)
 
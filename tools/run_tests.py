@@ -1,10 +1,22 @@
+import concurrent.futures
+import functools
 import json
 import os
 import pathlib
-import re
+import shutil
 import subprocess
 import sys
-from typing import Dict, List, Tuple
+from typing import Dict, List, Sequence, Tuple
+
+from _testing import (
+    check_contains,
+    check_regex,
+    check_solution,
+    normalize_dash_bytes,
+    normalize_dashes,
+    parse_input_tolerance,
+    precompile_patterns,
+)
 
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
@@ -12,12 +24,12 @@ TESTS_ROOT = ROOT / "tests"
 BUILD_ROOT = ROOT / ".build"
 
 
+@functools.lru_cache(maxsize=None)
 def read_manifest(lab: str) -> dict:
     manifest_path = TESTS_ROOT / f"lab-{lab}" / "manifest.json"
     if not manifest_path.exists():
         raise FileNotFoundError(f"Нет манифеста тестов: {manifest_path}")
-    with manifest_path.open("r", encoding="utf-8") as handle:
-        return json.load(handle)
+    return json.loads(manifest_path.read_bytes())
 
 
 def detect_language(lab_dir: pathlib.Path) -> Tuple[str, pathlib.Path]:
@@ -48,7 +60,7 @@ def compile_program(lang: str, source: pathlib.Path, build_dir: pathlib.Path) ->
         return [str(output)]
     if lang == "java":
         subprocess.run(["javac", str(source)], check=True, cwd=source.parent)
-        return ["java", "-cp", str(source.parent), "Main"]
+        return [shutil.which("java") or "java", "-cp", str(source.parent), "Main"]
     if lang == "go":
         output = build_dir / "main"
         subprocess.run(["go", "build", "-o", str(output), str(source)], check=True)
@@ -61,18 +73,26 @@ def compile_program(lang: str, source: pathlib.Path, build_dir: pathlib.Path) ->
     raise RuntimeError("Не удалось определить язык. Добавьте main.py/main.c/main.cpp/Main.java.")
 
 
-def run_test(cmd: List[str], input_data: bytes, timeout_sec: int) -> subprocess.CompletedProcess:
+def run_test(cmd: Sequence[str], input_data: bytes, timeout_sec: int) -> subprocess.CompletedProcess:
+    # На POSIX subprocess запускает программу через posix_spawn, только если путь к ней
+    # содержит каталог и не заданы close_fds, cwd и preexec_fn. Там дескрипторы Python
+    # по умолчанию не наследуются (PEP 446), так что close_fds не нужен. На Windows
+    # пайпы дочернего процесса наследуемые, и только close_fds=True не дает параллельным
+    # тестам получить чужие дескрипторы.
     return subprocess.run(
         cmd,
         input=input_data,
         capture_output=True,
         timeout=timeout_sec,
         check=False,
+        close_fds=os.name == "nt",
     )
 
 
-def normalize_text(value: str) -> str:
-    return value.replace("\u2013", "-").replace("\u2014", "-").replace("\u2212", "-")
+def decode_output(stdout: bytes, stderr: bytes) -> str:
+    stdout_text = stdout.decode("utf-8", errors="replace")
+    stderr_text = stderr.decode("utf-8", errors="replace")
+    return f"{stdout_text}\n{stderr_text}" if stderr_text else stdout_text
 
 
 def extract_first_line(output_text: str) -> str:
@@ -107,79 +127,13 @@ def format_expected(out_contains: List[str], out_regex: List[str], expected_solu
     return "\n".join(parts)
 
 
-def check_contains(stdout: str, expected: List[str]) -> List[str]:
-    missing = []
-    normalized_stdout = normalize_text(stdout)
-    for item in expected:
-        normalized_item = normalize_text(item)
-        if normalized_item not in normalized_stdout:
-            missing.append(item)
-    return missing
-
-
-def check_regex(stdout: str, expected: List[str]) -> List[str]:
-    missing = []
-    normalized_stdout = normalize_text(stdout)
-    for pattern in expected:
-        if re.search(pattern, normalized_stdout) is None:
-            missing.append(f"regex:{pattern}")
-    return missing
-
-
-def extract_solution(stdout: str) -> Dict[int, float]:
-    values: Dict[int, float] = {}
-    for match in re.finditer(
-        r"x\s*\[\s*(\d+)\s*\]\s*=\s*([+-]?\d+(?:\.\d+)?(?:e[+-]?\d+)?)",
-        stdout,
-        flags=re.IGNORECASE,
-    ):
-        values[int(match.group(1))] = float(match.group(2))
-    for match in re.finditer(
-        r"x\s*(\d+)\s*=\s*([+-]?\d+(?:\.\d+)?(?:e[+-]?\d+)?)",
-        stdout,
-        flags=re.IGNORECASE,
-    ):
-        index = int(match.group(1))
-        if index not in values:
-            values[index] = float(match.group(2))
-    return values
-
-
-def check_solution(stdout: str, expected: List[float], tol: float) -> List[str]:
-    missing = []
-    found = extract_solution(stdout)
-    if not found:
-        return ["solution:not_found"]
-
-    indices = sorted(found.keys())
-    is_zero_based = 0 in indices
-
-    for i, expected_value in enumerate(expected):
-        key = i if is_zero_based else i + 1
-        if key not in found:
-            missing.append(f"solution:x{key}:not_found")
-            continue
-        actual = found[key]
-        if abs(actual - expected_value) > tol:
-            missing.append(f"solution:x{key}:expected≈{expected_value}")
-    return missing
-
-
-def parse_input_tolerance(input_text: str, default_tol: float) -> float:
-    matches = re.findall(r"[+-]?\d+(?:\.\d+)?(?:e[+-]?\d+)?", input_text, flags=re.IGNORECASE)
-    if not matches:
-        return default_tol
-    try:
-        return float(matches[-1]) * 3
-    except ValueError:
-        return default_tol
-
-
-def load_lines(path: pathlib.Path) -> List[str]:
-    if not path.exists():
-        raise FileNotFoundError(f"Файл не найден: {path}")
-    with path.open("r", encoding="utf-8") as handle:
-        return [line.strip() for line in handle.read().splitlines() if line.strip()]
+@functools.lru_cache(maxsize=None)
+def load_lines(path: str) -> Tuple[str, ...]:
+    file_path = pathlib.Path(path)
+    if not file_path.exists():
+        raise FileNotFoundError(f"Файл не найден: {file_path}")
+    with file_path.open("r", encoding="utf-8") as handle:
+        return tuple(line.strip() for line in handle.read().splitlines() if line.strip())
 
 
 def normalize_expected(value, base_dir: pathlib.Path) -> List[str]:
@@ -195,12 +149,18 @@ def normalize_expected(value, base_dir: pathlib.Path) -> List[str]:
         if not isinstance(item, str):
             item = str(item)
         if item.endswith(".txt"):
-            resolved.extend(load_lines(base_dir / item))
+            resolved.extend(load_lines(str(base_dir / item)))
         else:
             resolved.append(item)
     return resolved
 
 
+def precompile_manifest_patterns(tests: List[Dict], expected_dir: pathlib.Path) -> None:
+    for test in tests:
+        for entry in [test, *(test.get("variants") or [])]:
+            precompile_patterns(normalize_expected(entry.get("out_regex"), expected_dir))
+
+
 def resolve_input(test: Dict, input_dir: pathlib.Path) -> bytes:
     if "in" not in test:
         raise KeyError("В тесте нет поля 'in'")
@@ -220,12 +180,14 @@ def evaluate_variant(
     variant: Dict,
     input_text: str,
     default_tol: float,
+    fail_fast: bool = False,
 ) -> Tuple[bool, List[str]]:
     missing = []
-    missing.extend(check_contains(stdout, variant.get("out_contains", [])))
-    missing.extend(check_regex(stdout, variant.get("out_regex", [])))
+    missing.extend(check_contains(stdout, variant.get("out_contains", []), fail_fast))
+    if not (fail_fast and missing):
+        missing.extend(check_regex(stdout, variant.get("out_regex", []), fail_fast))
     expected_solution = variant.get("expected_solution")
-    if expected_solution is not None:
+    if expected_solution is not None and not (fail_fast and missing):
         if variant.get("use_input_tolerance"):
             scale = float(variant.get("tolerance_scale") or 1.0)
             tol = parse_input_tolerance(input_text, default_tol) * scale
@@ -235,6 +197,116 @@ def evaluate_variant(
     return len(missing) == 0, missing
 
 
+def run_single_test(
+    index: int,
+    test: Dict,
+    cmd: Sequence[str],
+    input_dir: pathlib.Path,
+    expected_dir: pathlib.Path,
+    timeout_sec: int,
+    default_tol: float,
+    select_variant_by_output: bool,
+    show_answers: bool,
+    fail_fast: bool = False,
+) -> Tuple[bool, List[str]]:
+    lines: List[str] = []
+    input_data = resolve_input(test, input_dir)
+    input_text = input_data.decode("utf-8", errors="replace")
+    lines.append(f"\nТест {index}:")
+    lines.append(input_text)
+    variants = test.get("variants")
+    expected = normalize_expected(test.get("out_contains"), expected_dir)
+    expected_regex = normalize_expected(test.get("out_regex"), expected_dir)
+    try:
+        result = run_test(cmd, input_data, timeout_sec)
+    except subprocess.TimeoutExpired:
+        test_label = test.get("description") or f"#{index}"
+        lines.append(f"Превышено время выполнения ({timeout_sec} с)")
+        lines.append(f"Тест {test_label} не прошел")
+        return False, lines
+    output_text = decode_output(
+        normalize_dash_bytes(result.stdout),
+        normalize_dash_bytes(result.stderr),
+    )
+
+    if variants:
+        passed = False
+        missing = []
+        selected_variant = None
+        selected_label = ""
+        last_resolved: Dict = {}
+        if select_variant_by_output:
+            first_line = extract_first_line(output_text)
+            for variant in variants:
+                selector = get_variant_selector(variant)
+                if selector and normalize_dashes(selector) in first_line:
+                    selected_variant = variant
+                    selected_label = variant.get("description") or selector
+                    break
+
+        variant_list = [selected_variant] if selected_variant else variants
+        for variant in variant_list:
+            last_resolved = {
+                "out_contains": normalize_expected(variant.get("out_contains"), expected_dir),
+                "out_regex": normalize_expected(variant.get("out_regex"), expected_dir),
+                "expected_solution": variant.get("expected_solution"),
+                "solution_tolerance": variant.get("solution_tolerance"),
+                "use_input_tolerance": variant.get("use_input_tolerance"),
+                "tolerance_scale": variant.get("tolerance_scale"),
+            }
+            passed, missing = evaluate_variant(
+                output_text,
+                last_resolved,
+                input_text,
+                default_tol,
+                fail_fast,
+            )
+            if passed:
+                break
+            if selected_variant:
+                break
+    else:
+        missing = []
+        missing.extend(check_contains(output_text, expected, fail_fast))
+        if not (fail_fast and missing):
+            missing.extend(check_regex(output_text, expected_regex, fail_fast))
+        if "expected_solution" in test and not (fail_fast and missing):
+            if test.get("use_input_tolerance"):
+                scale = float(test.get("tolerance_scale", 1.0))
+                tol = parse_input_tolerance(input_text, default_tol) * scale
+            else:
+                tol = float(test.get("solution_tolerance", default_tol))
+            missing.extend(check_solution(output_text, test.get("expected_solution", []), tol))
+        passed = len(missing) == 0
+
+    if not passed:
+        if output_text:
+            lines.append("\n--- OUTPUT (stdout+stderr) ---")
+            lines.append(decode_output(result.stdout, result.stderr))
+            lines.append("--- END OUTPUT ---\n")
+        if variants and select_variant_by_output and selected_label:
+            lines.append(f"Выбранный вариант: {selected_label}")
+        if show_answers:
+            if variants:
+                exp_contains = last_resolved["out_contains"]
+                exp_regex = last_resolved["out_regex"]
+                exp_solution = last_resolved["expected_solution"]
+            else:
+                exp_contains = expected
+                exp_regex = expected_regex
+                exp_solution = test.get("expected_solution")
+            details = format_expected(exp_contains, exp_regex, exp_solution)
+            if details:
+                lines.append(details)
+        test_label = test.get("description") or f"#{index}"
+        lines.append(f"Тест {test_label} не прошел")
+    else:
+        test_label = test.get("description") or f"#{index}"
+        lines.append(f"Тест {test_label} прошел")
+
+    return passed, lines
+
+
 def main() -> int:
     lab = os.getenv("LAB")
     if not lab:
@@ -248,7 +320,7 @@ def main() -> int:
 
     lang, source = detect_language(lab_dir)
     build_dir = BUILD_ROOT / f"lab-{lab}"
-    cmd = compile_program(lang, source, build_dir)
+    cmd = tuple(compile_program(lang, source, build_dir))
 
     manifest = read_manifest(lab)
     show_answers = bool(manifest.get("show_answers"))
@@ -267,100 +339,41 @@ def main() -> int:
         print("Манифест не содержит тестов.", file=sys.stderr)
         return 1
 
+    lab_tests_dir = TESTS_ROOT / f"lab-{lab}"
+    input_dir = lab_tests_dir / "input"
+    expected_dir = lab_tests_dir / "expected"
+    precompile_manifest_patterns(tests, expected_dir)
+
+    # В CI важен только итог теста, поэтому проверки останавливаются на первом промахе.
+    fail_fast = bool(os.getenv("GITHUB_OUTPUT"))
+    max_workers = min(len(tests), os.cpu_count() or 1)
     failed = 0
-    for index, test in enumerate(tests, start=1):
-        lab_tests_dir = TESTS_ROOT / f"lab-{lab}"
-        input_dir = lab_tests_dir / "input"
-        expected_dir = lab_tests_dir / "expected"
-        input_data = resolve_input(test, input_dir)
-        input_text = input_data.decode("utf-8", errors="replace")
-        print(f"\nТест {index}:")
-        print(input_text)
-        variants = test.get("variants")
-        expected = normalize_expected(test.get("out_contains"), expected_dir)
-        expected_regex = normalize_expected(test.get("out_regex"), expected_dir)
-        result = run_test(cmd, input_data, timeout_sec)
-        stdout = result.stdout.decode("utf-8", errors="replace")
-        stderr = result.stderr.decode("utf-8", errors="replace")
-        output_text = f"{stdout}\n{stderr}" if stderr else stdout
-
-        if variants:
-            passed = False
-            missing = []
-            selected_variant = None
-            selected_label = ""
-            last_variant = None
-            if select_variant_by_output:
-                first_line = extract_first_line(output_text)
-                normalized_first = normalize_text(first_line)
-                for variant in variants:
-                    selector = get_variant_selector(variant)
-                    if selector and normalize_text(selector) in normalized_first:
-                        selected_variant = variant
-                        selected_label = variant.get("description") or selector
-                        break
-
-            variant_list = [selected_variant] if selected_variant else variants
-            for variant in variant_list:
-                last_variant = variant
-                variant_expected = normalize_expected(variant.get("out_contains"), expected_dir)
-                variant_regex = normalize_expected(variant.get("out_regex"), expected_dir)
-                passed, missing = evaluate_variant(
-                    output_text,
-                    {
-                        "out_contains": variant_expected,
-                        "out_regex": variant_regex,
-                        "expected_solution": variant.get("expected_solution"),
-                        "solution_tolerance": variant.get("solution_tolerance"),
-                        "use_input_tolerance": variant.get("use_input_tolerance"),
-                        "tolerance_scale": variant.get("tolerance_scale"),
-                    },
-                    input_text,
-                    default_tol,
-                )
-                if passed:
-                    break
-                if selected_variant:
-                    break
-        else:
-            missing = []
-            missing.extend(check_contains(output_text, expected))
-            missing.extend(check_regex(output_text, expected_regex))
-            if "expected_solution" in test:
-                if test.get("use_input_tolerance"):
-                    scale = float(test.get("tolerance_scale", 1.0))
-                    tol = parse_input_tolerance(input_text, default_tol) * scale
-                else:
-                    tol = float(test.get("solution_tolerance", default_tol))
-                missing.extend(check_solution(output_text, test.get("expected_solution", []), tol))
-            passed = len(missing) == 0
-
-        if not passed:
-            failed += 1
-            if output_text:
-                print("\n--- OUTPUT (stdout+stderr) ---")
-                print(output_text)
-                print("--- END OUTPUT ---\n")
-            if variants and select_variant_by_output and selected_label:
-                print(f"Выбранный вариант: {selected_label}")
-            if show_answers:
-                if variants:
-                    variant_for_expected = selected_variant or last_variant
-                    exp_contains = normalize_expected(variant_for_expected.get("out_contains"), expected_dir)
-                    exp_regex = normalize_expected(variant_for_expected.get("out_regex"), expected_dir)
-                    exp_solution = variant_for_expected.get("expected_solution")
-                else:
-                    exp_contains = expected
-                    exp_regex = expected_regex
-                    exp_solution = test.get("expected_solution")
-                details = format_expected(exp_contains, exp_regex, exp_solution)
-                if details:
-                    print(details)
-            test_label = test.get("description") or f"#{index}"
-            print(f"Тест {test_label} не прошел")
-        else:
-            test_label = test.get("description") or f"#{index}"
-            print(f"Тест {test_label} прошел")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                run_single_test,
+                index,
+                test,
+                cmd,
+                input_dir,
+                expected_dir,
+                timeout_sec,
+                default_tol,
+                select_variant_by_output,
+                show_answers,
+                fail_fast,
+            )
+            for index, test in enumerate(tests, start=1)
+        ]
+        try:
+            for future in futures:
+                passed, lines = future.result()
+                print("\n".join(lines))
+                if not passed:
+                    failed += 1
+        except BaseException:
+            executor.shutdown(cancel_futures=True)
+            raise
 
     return 0 if failed == 0 else 1
 